@@ -1,89 +1,318 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+import pyarrow.parquet as pq
 import datetime
+import hashlib
+import hmac
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 st.set_page_config(page_title="Car Tuner Pro", page_icon="🏎️", layout="centered")
 
 # --- 1. Generic Load Data Function ---
-@st.cache_data(ttl=0)
-def load_data(gid):
+# Columns each screen actually reads; anything else in the sheets is never loaded
+FITMENT_COLS = ['make', 'model', 'position', 'width_mm', 'aspect_ratio', 'rim_diameter_in', 'setup_type',
+                '_tire_label']
+ENGINE_COLS = ['engine', 'hp', 'power_limit', 'boost', 'ignition', 'fuel_mix', 'valve_timing']
+VALUE_COLS = ['car name', 'value', 'junkyard rate', 'auction rate']
+
+# Highly repeated text columns, stored as categoricals so masks/groupbys compare int codes
+CATEGORY_COLS = ('make', 'model', 'position', 'setup_type', 'engine')
+
+# How long a downloaded sheet snapshot on disk stays fresh (seconds)
+SNAPSHOT_TTL = 600
+# After a failed refresh, how long to wait before trying that sheet again (seconds)
+FETCH_RETRY_DELAY = 60
+# Bump when clean_sheet changes what a snapshot contains
+SNAPSHOT_FORMAT = 4
+
+# Alternate spellings accepted in the position column -> the names POSITION_TO_CORNERS uses
+POSITION_ALIASES = {
+    'rear_left': 'back_left', 'rear_right': 'back_right',
+    'fl': 'front_left', 'fr': 'front_right', 'rl': 'back_left', 'rr': 'back_right',
+}
+
+def canonical_position(pos):
+    pos = pos.lower().replace(' ', '_')
+    return POSITION_ALIASES.get(pos, pos)
+
+def fetch_sheet(url, etag=None):
+    # Conditional GET: returns (None, etag) when the sheet is unchanged since `etag`
+    headers = {'If-None-Match': etag} if etag else {}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as resp:
+            return resp.read(), resp.headers.get('ETag')
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, etag
+        raise
+
+def read_sheet_csv(data):
+    # pyarrow's multithreaded parser is noticeably faster than the default C engine.
+    # It returns blank text cells as None; clean_sheet turns them into ''
+    return pd.read_csv(io.BytesIO(data), engine='pyarrow')
+
+def snapshot_source(gid):
+    # (local snapshot path, CSV export URL) for a sheet tab
     try:
         sheet_id = st.secrets["connections"]["gsheet_id"]
     except KeyError:
         st.error("Google Sheet ID not found in secrets.")
         st.stop()
 
+    # Snapshots live on disk so every worker/session shares one download; point
+    # cache_dir at a shared volume to share them across containers too
+    cache_dir = st.secrets["connections"].get("cache_dir", tempfile.gettempdir())
+    os.makedirs(cache_dir, exist_ok=True)
+    local = os.path.join(cache_dir, f"sheet_{sheet_id}_{gid}_v{SNAPSHOT_FORMAT}.parquet")
     url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
-    
+    return local, url
+
+def snapshot_is_fresh(local):
+    return os.path.exists(local) and time.time() - os.path.getmtime(local) < SNAPSHOT_TTL
+
+def fetch_failed_recently(local):
+    # A failed refresh leaves a marker file; don't try again until FETCH_RETRY_DELAY has passed,
+    # so a missing or stale snapshot doesn't make every rerun block on another timeout
     try:
-        df = pd.read_csv(url)
+        return time.time() - os.path.getmtime(f"{local}.failed") < FETCH_RETRY_DELAY
+    except OSError:
+        return False
+
+def refresh_snapshot(local, url):
+    if snapshot_is_fresh(local) or fetch_failed_recently(local):
+        return
+
+    # Sessions are threads of one process: let one of them refresh, the rest wait and reuse it
+    with snapshot_lock(local):
+        if snapshot_is_fresh(local) or fetch_failed_recently(local):
+            return
+        download_snapshot(local, url)
+
+def download_snapshot(local, url):
+    # ETag of the download the current snapshot was built from, if the server sent one
+    etag_path = f"{local}.etag"
+    failed_path = f"{local}.failed"
+    old_etag = None
+    if os.path.exists(local) and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            old_etag = f.read()
+
+    try:
+        data, etag = fetch_sheet(url, old_etag)
+        if data is None:
+            # Unchanged on Google's side: just mark the snapshot fresh again
+            os.utime(local)
+        else:
+            df = clean_sheet(read_sheet_csv(data))
+            write_atomic(local, lambda tmp: df.to_parquet(tmp, index=False))
     except Exception:
-        return pd.DataFrame() # Return empty if sheet not found/loaded
-    
+        # Sheet not found/loaded/parsed: keep serving the last snapshot (if any) and
+        # record the failure so the next attempt waits FETCH_RETRY_DELAY
+        with open(failed_path, 'a'):
+            pass
+        os.utime(failed_path)
+        return
+
+    try:
+        os.remove(failed_path)
+    except FileNotFoundError:
+        pass
+    if data is None:
+        return
+
+    if etag:
+        def write_etag(tmp):
+            with open(tmp, 'w') as f:
+                f.write(etag)
+        write_atomic(etag_path, write_etag)
+    elif os.path.exists(etag_path):
+        os.remove(etag_path)
+
+def clean_column_names(columns):
+    # Lower-case/strip headers and make them unique the way the C CSV engine does
+    # (blank -> 'unnamed: N', repeats -> 'name.1'); pyarrow leaves them as they are,
+    # and Parquet refuses duplicate column names
+    names = []
+    for i, col in enumerate(columns):
+        base = str(col).lower().strip() or f"unnamed: {i}"
+        name, n = base, 0
+        while name in names:
+            n += 1
+            name = f"{base}.{n}"
+        names.append(name)
+    return names
+
+def clean_sheet(df):
     # Standardize Column Names
-    df.columns = df.columns.str.lower().str.strip()
+    df.columns = clean_column_names(df.columns)
     
-    # Clean string columns
+    # Clean string columns ('string' covers pandas 3's default str dtype)
+    # (blanks become '' so sorting the dropdowns never mixes in floats)
+    for col in df.select_dtypes(['object', 'string']).columns:
+        df[col] = [s.strip() for s in df[col].fillna('').astype(str)]
+
+    # Downcast integer columns (widths, HP, tune values...) to the narrowest dtype that fits.
+    # Floats stay float64: float32 would show values like 1.2 as 1.2000000476837158
     for col in df.columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].astype(str).str.strip()
-            
+        if df[col].dtype.kind in 'iu':
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    # Canonical position names, worked out once per distinct value rather than per row
+    if 'position' in df.columns:
+        positions = df['position']
+        df['position'] = positions.map({p: canonical_position(p) for p in positions.cat.categories}).astype('category')
+
+    # Diagram label for each tire size, formatted once here rather than on every render
+    if {'width_mm', 'aspect_ratio', 'rim_diameter_in'} <= set(df.columns):
+        df['_tire_label'] = ("<b>" + df['width_mm'].astype(str) + " / " + df['aspect_ratio'].astype(str)
+                             + " R" + df['rim_diameter_in'].astype(str) + "</b>").astype('category')
     return df
 
+def write_atomic(path, write):
+    # Write to a unique temp file next to `path`, then rename, so no reader (or other
+    # writer, in this process or another worker) ever sees a half-written file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+@st.cache_resource(show_spinner=False)
+def snapshot_locks():
+    # Script globals are rebuilt on every rerun, so the process-wide lock table lives here
+    return {}, threading.Lock()
+
+SNAPSHOT_LOCKS = snapshot_locks()
+
+def snapshot_lock(local):
+    locks, guard = SNAPSHOT_LOCKS
+    with guard:
+        if local not in locks:
+            locks[local] = threading.Lock()
+        return locks[local]
+
+class SheetUnavailable(Exception):
+    pass
+
+def snapshot_version(path):
+    # Changes whenever the snapshot is rewritten or re-validated, so caches keyed on it
+    # pick up new data on the next rerun instead of waiting out their own TTL
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+@st.cache_data(ttl=600, show_spinner="Loading sheet...")
+def load_data(path, version, columns=None):
+    # Only reads the local snapshot; refresh_snapshot is what talks to Google.
+    # `version` is only part of the cache key (the ttl just bounds memory)
+    if not os.path.exists(path):
+        # Raised rather than returning an empty frame: st.cache_data doesn't cache
+        # exceptions, so the next rerun retries instead of serving "empty" for the TTL
+        raise SheetUnavailable(path)
+
+    # Only read the columns the app uses (skipping any the sheet doesn't have)
+    if columns is not None:
+        available = pq.read_schema(path).names
+        columns = [c for c in columns if c in available]
+    return pd.read_parquet(path, columns=columns)
+
+def load_sheet(path, version, columns=None):
+    try:
+        return load_data(path, version, columns=columns)
+    except SheetUnavailable:
+        return pd.DataFrame() # Return empty if sheet not found/loaded
+
 # --- 2. Load All Datasets ---
 try:
-    # A. Fitment Data
     fitment_gid = st.secrets["connections"].get("fitment_gid", "0")
-    df_fitment = load_data(fitment_gid)
-    if 'position' in df_fitment.columns:
-        df_fitment['position'] = df_fitment['position'].str.lower().str.replace(' ', '_')
+    engine_gid = st.secrets["connections"].get("engine_gid", "0") 
+    values_gid = st.secrets["connections"].get("values_gid", "0")
+    sources = {gid: snapshot_source(gid) for gid in (fitment_gid, engine_gid, values_gid)}
+
+    # Refresh any stale snapshots in parallel (network bound), so the
+    # load_data calls below only read local files
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        list(ex.map(lambda src: refresh_snapshot(*src), set(sources.values())))
+
+    paths = {gid: local for gid, (local, _) in sources.items()}
+    versions = {gid: snapshot_version(local) for gid, local in paths.items()}
+
+    # A. Fitment Data
+    df_fitment = load_sheet(paths[fitment_gid], versions[fitment_gid], columns=FITMENT_COLS)
 
     # B. Engine Data
-    engine_gid = st.secrets["connections"].get("engine_gid", "0") 
-    df_engine = load_data(engine_gid)
+    df_engine = load_sheet(paths[engine_gid], versions[engine_gid], columns=ENGINE_COLS)
     
     # C. Value Data (New!)
-    values_gid = st.secrets["connections"].get("values_gid", "0")
-    df_values = load_data(values_gid)
+    df_values = load_sheet(paths[values_gid], versions[values_gid], columns=VALUE_COLS)
 
 except Exception as e:
     st.error(f"Error loading databases: {e}")
     st.stop()
 
+# --- Helper: Cached Lookup Indices ---
+@st.cache_data(show_spinner=False)
+def build_make_model_index(df):
+    # make -> sorted list of models, built once per loaded sheet
+    if 'make' not in df.columns or 'model' not in df.columns:
+        return {}
+    return {m: sorted(g['model'].unique().tolist()) for m, g in df.groupby('make', sort=True, observed=True)}
+
+@st.cache_data(show_spinner=False)
+def sorted_unique(df, col):
+    # Dropdown options, sorted once per loaded sheet instead of on every rerun
+    return sorted(df[col].unique().tolist())
+
+@st.cache_data(show_spinner=False)
+def build_mm_index(df):
+    # (make, model) -> positional row indices for that car
+    if 'make' not in df.columns or 'model' not in df.columns:
+        return {}
+    return df.groupby(['make', 'model'], sort=False, observed=True).indices
+
+@st.cache_data(show_spinner=False)
+def build_first_row_index(df, col):
+    # value -> position of its first row (same row as .iloc[0] on a filter)
+    if col not in df.columns:
+        return {}
+    return dict(zip(df[col].values[::-1], range(len(df) - 1, -1, -1)))
+
 # --- 3. Diagram Logic (Fitment) ---
-def create_tpms_diagram(car_data, make, model):
-    wheel_corners = {
-        'FL': {'text': "N/A", 'x': -2.9, 'y': 2.5,  'color': '#adadad'},
-        'FR': {'text': "N/A", 'x': 2.9,  'y': 2.5,  'color': '#adadad'},
-        'RL': {'text': "N/A", 'x': -2.9, 'y': -2.5, 'color': '#adadad'},
-        'RR': {'text': "N/A", 'x': 2.9,  'y': -2.5, 'color': '#adadad'}
-    }
-
-    def fmt(row):
-        return f"<b>{row['width_mm']} / {row['aspect_ratio']} R{row['rim_diameter_in']}</b>"
-
-    for _, row in car_data.iterrows():
-        pos = row['position']
-        label = fmt(row)
-        if pos in ['front', 'front_axle']:
-            wheel_corners['FL'].update({'text': label, 'color': '#333'})
-            wheel_corners['FR'].update({'text': label, 'color': '#333'})
-        elif pos in ['back', 'rear', 'rear_axle']:
-            wheel_corners['RL'].update({'text': label, 'color': '#333'})
-            wheel_corners['RR'].update({'text': label, 'color': '#333'})
-        elif pos == 'all':
-            for key in wheel_corners:
-                wheel_corners[key].update({'text': label, 'color': '#333'})
-        elif pos == 'front_left':
-            wheel_corners['FL'].update({'text': label, 'color': '#333'})
-        elif pos == 'front_right':
-            wheel_corners['FR'].update({'text': label, 'color': '#333'})
-        elif pos == 'back_left':
-            wheel_corners['RL'].update({'text': label, 'color': '#333'})
-        elif pos == 'back_right':
-            wheel_corners['RR'].update({'text': label, 'color': '#333'})
+# Which wheel corners each sheet 'position' value applies to
+POSITION_TO_CORNERS = {
+    'front': ('FL', 'FR'), 'front_axle': ('FL', 'FR'),
+    'back': ('RL', 'RR'), 'rear': ('RL', 'RR'), 'rear_axle': ('RL', 'RR'),
+    'all': ('FL', 'FR', 'RL', 'RR'),
+    'front_left': ('FL',), 'front_right': ('FR',),
+    'back_left': ('RL',), 'back_right': ('RR',),
+}
+
+# Where each corner's tire label is drawn
+CORNER_XY = (('FL', -2.9, 2.5), ('FR', 2.9, 2.5), ('RL', -2.9, -2.5), ('RR', 2.9, -2.5))
 
+@st.cache_resource
+def _base_fig_dict():
+    # Plotly is imported here, not at the top, so pages that never draw a diagram skip its import
+    import plotly.graph_objects as go
+
+    # Car body, windshield, wheels and axes are the same for every car
     fig = go.Figure()
     fig.add_shape(type="rect", x0=-1.5, y0=-3.5, x1=1.5, y1=3.5,
         line=dict(color="#2c3e50", width=3), fillcolor="#ecf0f1", opacity=1)
@@ -93,16 +322,86 @@ def create_tpms_diagram(car_data, make, model):
     for wx, wy in wheels:
         fig.add_shape(type="rect", x0=wx-0.3, y0=wy-0.6, x1=wx+0.3, y1=wy+0.6, 
             fillcolor="#1a1a1a", line_color="black")
-    for key, data in wheel_corners.items():
-        fig.add_annotation(x=data['x'], y=data['y'], text=data['text'], showarrow=False,
-            font=dict(size=18, color=data['color']), bgcolor="rgba(255,255,255,0.9)",
-            bordercolor=data['color'], borderwidth=1, borderpad=5)
     fig.update_xaxes(range=[-5.5, 5.5], visible=False, fixedrange=True)
     fig.update_yaxes(range=[-5, 5], visible=False, fixedrange=True)
-    fig.update_layout(title_text=f"{make} {model} Fitment", title_x=0.5,
+    fig.update_layout(title_x=0.5,
         width=600, height=600, margin=dict(l=10, r=10, t=50, b=10),
         plot_bgcolor="white", hovermode=False)
-    return fig
+    return fig.to_dict()
+
+def create_tpms_diagram(car_data, make, model):
+    # Hashable (position, label) pairs so the figure can be cached per car
+    fitment_tuple = tuple(zip(car_data['position'].tolist(), car_data['_tire_label'].tolist()))
+    return _build_fig(make, model, fitment_tuple)
+
+# Shared across sessions without a pickle round-trip; the figure is never mutated after this
+@st.cache_resource(ttl=3600, max_entries=256, show_spinner=False)
+def _build_fig(make, model, fitment_tuple):
+    import plotly.graph_objects as go
+
+    texts = {key: "N/A" for key, _, _ in CORNER_XY}
+    colors = {key: '#adadad' for key, _, _ in CORNER_XY}
+
+    for pos, label in fitment_tuple:
+        for key in POSITION_TO_CORNERS.get(pos, ()):
+            texts[key] = label
+            colors[key] = '#333'
+
+    # go.Figure copies the dict it is given, so only the keys we change need new containers
+    base = _base_fig_dict()
+    layout = dict(base['layout'], title=dict(base['layout']['title'], text=f"{make} {model} Fitment"))
+    layout['annotations'] = [
+        dict(x=x, y=y, text=texts[key], showarrow=False,
+            font=dict(size=18, color=colors[key]), bgcolor="rgba(255,255,255,0.9)",
+            bordercolor=colors[key], borderwidth=1, borderpad=5)
+        for key, x, y in CORNER_XY
+    ]
+    return go.Figure(dict(base, layout=layout))
+
+# Figures already shown in this session, so flipping back to a car skips rebuilding it.
+# Entries are tagged with the snapshot version they were built from and dropped once it changes.
+SESSION_FIG_LIMIT = 16
+
+def get_session_fig(key, version):
+    cache = st.session_state.setdefault('_fig_cache', OrderedDict())
+    entry = cache.get(key)
+    if entry is None or entry[0] != version:
+        return None
+    cache.move_to_end(key)
+    return entry[1]
+
+def put_session_fig(key, version, fig):
+    cache = st.session_state.setdefault('_fig_cache', OrderedDict())
+    cache[key] = (version, fig)
+    cache.move_to_end(key)
+    if len(cache) > SESSION_FIG_LIMIT:
+        cache.popitem(last=False)
+
+# --- Helper: Discord Market Text Parser ---
+# First non-blank line of an entry is the car name; the rest are "Field: value" lines
+MARKET_NAME_RE = re.compile(r'\S[^\n]*')
+MARKET_FIELD_RE = re.compile(r'^[ \t]*(Value|Junkyard Rate|Auction Rate):(.*)$', re.M)
+
+def parse_market_text(raw_text, batch_date):
+    rows = []
+    for entry in raw_text.split('━━━'):
+        name = MARKET_NAME_RE.search(entry)
+        if name is None:
+            continue
+        # Later lines win if a field is repeated
+        fields = {key: val.strip() for key, val in MARKET_FIELD_RE.findall(entry, name.end())}
+        rows.append((name.group().strip(), fields.get("Value", "0"),
+                     fields.get("Junkyard Rate", "N/A"), fields.get("Auction Rate", "N/A")))
+
+    new_df = pd.DataFrame(rows, columns=["Car Name", "Value", "Junkyard Rate", "Auction Rate"])
+    new_df.insert(0, "Date", batch_date)
+    return new_df
+
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def parsed_market_csv(raw_text, batch_date):
+    # Re-submitting the same paste/date reuses the parsed table and encoded CSV
+    new_df = parse_market_text(raw_text, batch_date)
+    return new_df, new_df.to_csv(index=False).encode('utf-8')
 
 # --- Helper: Simple Rule-Based Chatbot Logic ---
 def get_bot_response(user_input, df_fit, df_eng, df_val):
@@ -112,7 +411,7 @@ def get_bot_response(user_input, df_fit, df_eng, df_val):
     # 1. Search FITMENT Data
     if not df_fit.empty:
         # Check for Models
-        for index, row in df_fit.iterrows():
+        for row in df_fit.to_dict(orient='records'):
             # Check if model name appears in the user's question
             if str(row['model']).lower() in user_input:
                 responses.append(f"**🏎️ Fitment for {row['make']} {row['model']}:**")
@@ -121,7 +420,7 @@ def get_bot_response(user_input, df_fit, df_eng, df_val):
     
     # 2. Search ENGINE Data
     if not df_eng.empty and 'engine' in df_eng.columns:
-        for index, row in df_eng.iterrows():
+        for row in df_eng.to_dict(orient='records'):
             if str(row['engine']).lower() in user_input:
                 responses.append(f"**⚙️ Tuning for {row['engine']}:**")
                 responses.append(f"- HP: {row.get('hp', 'N/A')}")
@@ -131,7 +430,7 @@ def get_bot_response(user_input, df_fit, df_eng, df_val):
     
     # 3. Search VALUE Data
     if not df_val.empty and 'car name' in df_val.columns:
-        for index, row in df_val.iterrows():
+        for row in df_val.to_dict(orient='records'):
             if str(row['car name']).lower() in user_input:
                 responses.append(f"**💰 Market Value for {row['car name']}:**")
                 responses.append(f"- Current Value: ${row.get('value', 'N/A')}")
@@ -148,40 +447,53 @@ st.title("🏎️ Car Tuner Pro")
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["🛞 Wheel Fitment", "🔧 Engine Tuning", "💰 Car Values", "🛠️ Admin Tools", "🤖 Chat Assistant"])
 
 # === TAB 1: FITMENT ===
-with tab1:
+# Fragment: widgets in this tab only rerun this tab, not the whole page
+@st.fragment
+def render_fitment_tab(df_fitment, version):
     st.header("Wheel Fitment")
+    make_model_index = build_make_model_index(df_fitment)
     c1, c2 = st.columns(2)
     with c1:
-        makes_fit = sorted(df_fitment['make'].unique()) if 'make' in df_fitment.columns else []
+        makes_fit = list(make_model_index)
         sel_make_fit = st.selectbox("Make", options=makes_fit, index=None, key="fit_make", placeholder="Select Make")
     with c2:
         if sel_make_fit:
-            models_fit = sorted(df_fitment[df_fitment['make'] == sel_make_fit]['model'].unique())
+            models_fit = make_model_index[sel_make_fit]
             sel_model_fit = st.selectbox("Model", options=models_fit, index=None, key="fit_model", placeholder="Select Model")
         else:
             st.selectbox("Model", options=[], disabled=True, key="fit_model_ph", placeholder="Waiting...")
 
     if sel_make_fit and sel_model_fit:
         st.divider()
-        res_fit = df_fitment[(df_fitment['make'] == sel_make_fit) & (df_fitment['model'] == sel_model_fit)]
-        if not res_fit.empty:
-            fig = create_tpms_diagram(res_fit, sel_make_fit, sel_model_fit)
+        fig_key = (sel_make_fit, sel_model_fit)
+        fig = get_session_fig(fig_key, version)
+        if fig is None:
+            idx = build_mm_index(df_fitment).get(fig_key)
+            res_fit = df_fitment.iloc[idx] if idx is not None else df_fitment.iloc[:0]
+            if not res_fit.empty:
+                fig = create_tpms_diagram(res_fit, sel_make_fit, sel_model_fit)
+                put_session_fig(fig_key, version, fig)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No fitment data found.")
 
+with tab1:
+    render_fitment_tab(df_fitment, versions[fitment_gid])
+
 # === TAB 2: ENGINE TUNING ===
-with tab2:
+@st.fragment
+def render_engine_tab(df_engine):
     st.header("Engine Specs")
     if df_engine.empty:
         st.warning("Engine database empty or not loaded.")
     elif 'engine' in df_engine.columns:
-        engines = sorted(df_engine['engine'].unique())
+        engines = sorted_unique(df_engine, 'engine')
         sel_engine = st.selectbox("Choose Engine", options=engines, index=None, key="eng_select", placeholder="Select Engine...")
         
         if sel_engine:
             st.divider()
-            row = df_engine[df_engine['engine'] == sel_engine].iloc[0]
+            row = df_engine.iloc[build_first_row_index(df_engine, 'engine')[sel_engine]]
             if 'hp' in row:
                 st.metric("Target Horsepower", f"{row['hp']} HP")
             
@@ -189,37 +501,38 @@ with tab2:
             st.markdown("Bars represent value out of 100")
             settings_cols = ['power_limit', 'boost', 'ignition', 'fuel_mix', 'valve_timing']
             grid_cols = st.columns(2)
+            # Convert and clamp all the settings in one pass; non-numeric cells become NaN
+            nums = pd.to_numeric(row.reindex(settings_cols), errors='coerce')
+            bars = nums.fillna(0).clip(0, 100).astype(int)
             for i, col_name in enumerate(settings_cols):
                 if col_name in row:
-                    raw_val = row[col_name]
-                    try:
-                        val_int = int(raw_val)
-                        display_val = max(0, min(100, val_int))
-                    except ValueError:
-                        val_int = raw_val
-                        display_val = 0
-                    
                     title = col_name.replace('_', ' ').title()
                     with grid_cols[i % 2]:
-                        st.write(f"**{title}** ({val_int})")
-                        if isinstance(val_int, int):
-                            st.progress(display_val)
+                        if pd.notna(nums[col_name]):
+                            st.write(f"**{title}** ({int(nums[col_name])})")
+                            st.progress(int(bars[col_name]))
+                        else:
+                            st.write(f"**{title}** ({row[col_name]})")
+
+with tab2:
+    render_engine_tab(df_engine)
 
 # === TAB 3: CAR VALUES (NEW) ===
-with tab3:
+@st.fragment
+def render_values_tab(df_values):
     st.header("Market Values")
     
     if df_values.empty:
         st.warning("Value database not loaded. Check 'values_gid' in secrets.")
     elif 'car name' in df_values.columns:
         # Searchable Dropdown for Car Name
-        all_cars = sorted(df_values['car name'].unique())
+        all_cars = sorted_unique(df_values, 'car name')
         sel_car_val = st.selectbox("Search Vehicle", options=all_cars, index=None, key="val_select", placeholder="Type to search car...")
         
         if sel_car_val:
             st.divider()
             # Get data row
-            v_row = df_values[df_values['car name'] == sel_car_val].iloc[0]
+            v_row = df_values.iloc[build_first_row_index(df_values, 'car name')[sel_car_val]]
             
             # Display Main Value huge
             st.metric("Market Value", f"${v_row['value']}")
@@ -235,6 +548,9 @@ with tab3:
     else:
         st.error("Column 'Car Name' not found in values sheet.")
 
+with tab3:
+    render_values_tab(df_values)
+
 # === TAB 4: ADMIN TOOLS (PROTECTED) ===
 with tab4:
     st.header("🛠️ Admin Tools")
@@ -253,7 +569,10 @@ with tab4:
         password_attempt = st.text_input("Enter Admin Password:", type="password")
         
         if password_attempt:
-            if password_attempt == st.secrets["auth"]["admin_password"]:
+            # Constant-time compare of fixed-length digests so response time leaks nothing
+            attempt_digest = hashlib.sha256(password_attempt.encode()).digest()
+            stored_digest = hashlib.sha256(st.secrets["auth"]["admin_password"].encode()).digest()
+            if hmac.compare_digest(attempt_digest, stored_digest):
                 st.session_state["admin_logged_in"] = True
                 st.success("Access Granted!")
                 st.rerun() # Refresh to show tools immediately
@@ -272,61 +591,41 @@ with tab4:
         st.markdown("""
         **Instructions:**
         1. Paste the Discord text below.
-        2. Select the date for this data batch.
+        2. Select the date for this data batch and click **Parse**.
         3. Download the CSV and **append** it to your Google Sheet.
         """)
         
-        # Date Picker
-        batch_date = st.date_input("Date for this batch:", datetime.date.today())
-        
-        raw_text = st.text_area("Paste Discord Text Here:", height=200, placeholder="Merquis G Wafer\nValue: 145,400,000...")
+        # Form: typing or changing the date doesn't rerun anything until Parse is clicked
+        with st.form("admin_parse"):
+            # Date Picker
+            batch_date = st.date_input("Date for this batch:", datetime.date.today())
+            
+            raw_text = st.text_area("Paste Discord Text Here:", height=200, placeholder="Merquis G Wafer\nValue: 145,400,000...")
+            submitted = st.form_submit_button("Parse")
         
-        if raw_text:
+        if submitted:
+            st.session_state.pop("market_batch", None)
+        if submitted and raw_text:
             try:
-                entries = raw_text.split('━━━')
-                parsed_data = []
-                
-                for entry in entries:
-                    lines = [line.strip() for line in entry.strip().split('\n') if line.strip()]
-                    if not lines: continue
-                    
-                    car_name = lines[0]
-                    val = "0"
-                    junk = "N/A"
-                    auc = "N/A"
-                    
-                    for line in lines[1:]:
-                        if line.startswith("Value:"):
-                            val = line.replace("Value:", "").strip()
-                        elif line.startswith("Junkyard Rate:"):
-                            junk = line.replace("Junkyard Rate:", "").strip()
-                        elif line.startswith("Auction Rate:"):
-                            auc = line.replace("Auction Rate:", "").strip()
-                    
-                    parsed_data.append({
-                        "Date": batch_date,
-                        "Car Name": car_name,
-                        "Value": val,
-                        "Junkyard Rate": junk,
-                        "Auction Rate": auc
-                    })
-                
-                new_df = pd.DataFrame(parsed_data)
-                st.success(f"Parsed {len(new_df)} entries!")
-                
-                # Show preview
-                st.dataframe(new_df.head(), use_container_width=True)
-                
-                csv = new_df.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Download CSV (Append to Google Sheet)",
-                    data=csv,
-                    file_name=f"market_update_{batch_date}.csv",
-                    mime="text/csv",
-                )
-                
+                new_df, csv = parsed_market_csv(raw_text, batch_date)
+                # Keep the result so later reruns reuse it instead of re-parsing
+                st.session_state["market_batch"] = (new_df, csv, batch_date)
             except Exception as e:
                 st.error(f"Error parsing: {e}")
+        
+        if "market_batch" in st.session_state:
+            new_df, csv, parsed_date = st.session_state["market_batch"]
+            st.success(f"Parsed {len(new_df)} entries!")
+            
+            # Show preview
+            st.dataframe(new_df.head(), use_container_width=True)
+            
+            st.download_button(
+                label="📥 Download CSV (Append to Google Sheet)",
+                data=csv,
+                file_name=f"market_update_{parsed_date}.csv",
+                mime="text/csv",
+            )
 
 # === TAB 5: CHATBOT (NEW) ===
 with tab5: